@@ -0,0 +1,53 @@
+import threading
+import time
+
+from django.conf import settings
+
+
+LOAD_SHEDDING_DEFAULTS = {
+    'DB_LATENCY_THRESHOLD': 0.25,  # seconds, moving average per query
+    'SMOOTHING': 0.2,
+    'WINDOW': 30,  # seconds before a stale average is ignored
+    'RETRY_AFTER': 5,
+}
+
+
+def load_shedding_setting(name):
+    """Return a LOAD_SHEDDING setting, falling back to LOAD_SHEDDING_DEFAULTS."""
+    return getattr(settings, 'LOAD_SHEDDING', {}).get(name, LOAD_SHEDDING_DEFAULTS[name])
+
+
+class DatabaseLatencyMonitor:
+    """
+    Exponentially weighted moving average of the database query latency
+    seen by this process. Samples older than LOAD_SHEDDING['WINDOW']
+    seconds are considered stale, so a quiet period resets the average
+    to zero.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.average = 0.0
+        self.last_sample = None
+
+    def record(self, duration):
+        alpha = load_shedding_setting('SMOOTHING')
+        with self._lock:
+            if self.last_sample is None or self._is_stale():
+                # Restart from an idle baseline so that one slow query
+                # after a quiet period cannot trip load shedding on its own
+                self.average = 0.0
+            self.average += alpha * (duration - self.average)
+            self.last_sample = time.monotonic()
+
+    def _is_stale(self):
+        return time.monotonic() - self.last_sample > load_shedding_setting('WINDOW')
+
+    def is_degraded(self):
+        if self.last_sample is None or self._is_stale():
+            return False
+        return self.average > load_shedding_setting('DB_LATENCY_THRESHOLD')
+
+
+db_latency = DatabaseLatencyMonitor()
+
@@ -0,0 +1,191 @@
+import re
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from chats.latency import db_latency
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_coding = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+DEFAULTS = {
+    'MIN_SIZE': 1024,
+    'BROTLI_QUALITY': 5,
+    # gzip header padding against BREACH, as in Django's GZipMiddleware
+    'MAX_RANDOM_BYTES': 100,
+    # API encodings only; HTML pages carry CSRF tokens
+    'CONTENT_TYPES': ('application/json', 'application/msgpack'),
+    # Views whose responses carry credentials are never compressed
+    'EXCLUDE_URL_NAMES': ('token_obtain_pair', 'token_refresh'),
+}
+
+
+def compression_setting(name):
+    """Return a RESPONSE_COMPRESSION setting, falling back to DEFAULTS."""
+    return getattr(settings, 'RESPONSE_COMPRESSION', {}).get(name, DEFAULTS[name])
+
+
+def parse_accept_encoding(header):
+    """
+    Map each coding in an Accept-Encoding header to its q-value.
+    Codings with a malformed q-value are ignored.
+    """
+    codings = {}
+    for part in header.split(','):
+        match = re_accepts_coding.match(part)
+        if not match:
+            continue
+        coding, qvalue = match.groups()
+        try:
+            codings[coding.lower()] = float(qvalue) if qvalue else 1.0
+        except ValueError:
+            continue
+    return codings
+
+
+def select_encoding(request):
+    """
+    Pick the best content coding the client accepts: brotli when the
+    library is installed, otherwise gzip. Returns None for identity.
+    """
+    codings = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    wildcard = codings.get('*', 0)
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_q = None, 0
+    for coding in supported:
+        qvalue = codings.get(coding, wildcard)
+        if qvalue > best_q:
+            best, best_q = coding, qvalue
+    return best
+
+
+def brotli_compress_sequence(sequence):
+    compressor = brotli.Compressor(quality=compression_setting('BROTLI_QUALITY'))
+    for item in sequence:
+        # Flush after every chunk so clients receive data as it is produced
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def abrotli_compress_sequence(sequence):
+    compressor = brotli.Compressor(quality=compression_setting('BROTLI_QUALITY'))
+    async for item in sequence:
+        data = compressor.process(item) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def agzip_compress_sequence(sequence, max_random_bytes):
+    # Each chunk becomes its own gzip member, as in Django's GZipMiddleware
+    async for item in sequence:
+        yield compress_string(item, max_random_bytes=max_random_bytes)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses with brotli or gzip according to the client's
+    Accept-Encoding header.
+
+    Only RESPONSE_COMPRESSION['CONTENT_TYPES'] are compressed, so admin
+    and browsable API pages (which carry CSRF tokens) are left alone, as
+    are the views named in RESPONSE_COMPRESSION['EXCLUDE_URL_NAMES'] that
+    return credentials. gzip output keeps the random header padding of
+    Django's GZipMiddleware as a BREACH mitigation.
+
+    Regular responses smaller than RESPONSE_COMPRESSION['MIN_SIZE'] are
+    sent as-is; streaming responses are compressed chunk by chunk.
+    """
+
+    def should_compress(self, request, response):
+        # Leave already-encoded responses alone
+        if response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in compression_setting('CONTENT_TYPES'):
+            return False
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match and resolver_match.url_name in compression_setting('EXCLUDE_URL_NAMES'):
+            return False
+        return response.streaming or len(response.content) >= compression_setting('MIN_SIZE')
+
+    def process_response(self, request, response):
+        if not self.should_compress(request, response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = select_encoding(request)
+        if encoding is None:
+            return response
+
+        max_random_bytes = compression_setting('MAX_RANDOM_BYTES')
+        if response.streaming:
+            if encoding == 'br':
+                compress = abrotli_compress_sequence if response.is_async else brotli_compress_sequence
+                response.streaming_content = compress(response.streaming_content)
+            elif response.is_async:
+                response.streaming_content = agzip_compress_sequence(
+                    response.streaming_content, max_random_bytes
+                )
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=max_random_bytes
+                )
+            # The compressed length is unknown until the stream is consumed
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed_content = brotli.compress(
+                    response.content, quality=compression_setting('BROTLI_QUALITY')
+                )
+            else:
+                compressed_content = compress_string(
+                    response.content, max_random_bytes=max_random_bytes
+                )
+            # Return the original response if compression doesn't pay off
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        # A strong ETag no longer matches the encoded representation
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+
+        return response
+
+
+class DatabaseLatencyMiddleware:
+    """
+    Time every query on the default database connection and feed the
+    durations to `db_latency`, which drives load shedding in
+    chats.throttles.LoadSheddingThrottle.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(self.time_query):
+            return self.get_response(request)
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            db_latency.record(time.monotonic() - start)
@@ -0,0 +1,68 @@
+import datetime
+import decimal
+import uuid
+
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _encode_default(obj):
+    """
+    Encode the types DRF serializers hand back that MessagePack
+    does not know about natively.
+    """
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renderer which serializes response data to MessagePack.
+    Selected with `Accept: application/msgpack` or `?format=msgpack`.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackRenderer requires msgpack to be installed')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_encode_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack-serialized request bodies.
+    """
+    media_type = 'application/msgpack'
+
+    def __init__(self):
+        if msgpack is None:
+            raise ImproperlyConfigured('MessagePackParser requires msgpack to be installed')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except Exception as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -103,3 +103,24 @@ class ConversationSerializer(serializers.ModelSerializer):
         users = User.objects.filter(user_id__in=participant_ids)
         conversation.participants.set(users)
         return conversation
+
+
+class NormalizedMessageSerializer(MessageSerializer):
+    """
+    Message serializer for the normalized response shape: the sender is
+    referenced by id and sent once in the response's `users` map.
+    """
+    sender = serializers.PrimaryKeyRelatedField(read_only=True)
+
+
+class NormalizedConversationSerializer(ConversationSerializer):
+    """
+    Conversation serializer for the normalized response shape: participants
+    and message senders are referenced by id.
+    """
+    participants = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    messages = NormalizedMessageSerializer(many=True, read_only=True)
+
+    def get_participant_count(self, obj):
+        # participants are prefetched for the normalized shape
+        return len(obj.participants.all())
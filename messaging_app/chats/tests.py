@@ -1,3 +1,419 @@
-from django.test import TestCase
+import gzip
+import json
+import time
+from unittest import mock, skipIf
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from chats import latency, middleware
+from chats.latency import DatabaseLatencyMonitor, db_latency
+from chats.middleware import CompressionMiddleware, parse_accept_encoding, select_encoding
+from chats.models import Conversation, Message, User
+from chats.throttles import TokenBucketThrottle
+from chats.views import MessageViewSet
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def make_user(username):
+    return User.objects.create_user(
+        username=username, email=f'{username}@example.com', password='password123'
+    )
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Tests for content-coding negotiation and response compression."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.body = json.dumps([{'message_body': 'hello'}] * 200).encode()
+
+    def process(self, response, accept_encoding='gzip, br'):
+        request = self.factory.get('/api/messages/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=None):
+        return HttpResponse(body or self.body, content_type='application/json')
+
+    def test_parse_accept_encoding_qvalues(self):
+        self.assertEqual(
+            parse_accept_encoding('gzip;q=0.5, br, identity; q=0, x;q=bad'),
+            {'gzip': 0.5, 'br': 1.0, 'identity': 0.0},
+        )
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_select_encoding_prefers_brotli(self):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(select_encoding(request), 'br')
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_select_encoding_honours_qvalues(self):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip;q=0.8, br;q=0')
+        self.assertEqual(select_encoding(request), 'gzip')
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='*;q=0.5')
+        self.assertEqual(select_encoding(request), 'br')
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='identity')
+        self.assertIsNone(select_encoding(request))
+
+    def test_select_encoding_without_brotli(self):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        with mock.patch.object(middleware, 'brotli', None):
+            self.assertEqual(select_encoding(request), 'gzip')
+
+    def test_gzip_response(self):
+        response = self.process(self.json_response(), accept_encoding='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_response(self):
+        response = self.process(self.json_response())
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), self.body)
+
+    def test_min_size_cutoff(self):
+        response = self.process(self.json_response(b'{"a": 1}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        with override_settings(RESPONSE_COMPRESSION={'MIN_SIZE': len(self.body) + 1}):
+            response = self.process(self.json_response())
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_non_api_content_type_is_not_compressed(self):
+        response = self.process(HttpResponse(b'<p>x</p>' * 500, content_type='text/html'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def assert_streaming_compressed(self, encoding, decompress):
+        chunks = [self.body[:1000], self.body[1000:]]
+        response = self.process(
+            StreamingHttpResponse(iter(chunks), content_type='application/json'),
+            accept_encoding=encoding,
+        )
+        self.assertEqual(response['Content-Encoding'], encoding)
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(decompress(b''.join(response.streaming_content)), self.body)
+
+    def test_gzip_streaming_response(self):
+        self.assert_streaming_compressed('gzip', gzip.decompress)
+
+    @skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli_streaming_response(self):
+        self.assert_streaming_compressed('br', brotli.decompress)
+
+    def test_strong_etag_is_weakened(self):
+        response = self.json_response()
+        response['ETag'] = '"abc"'
+        response = self.process(response)
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    @override_settings(RESPONSE_COMPRESSION={'MIN_SIZE': 0})
+    def test_token_response_is_not_compressed(self):
+        make_user('alice')
+        response = self.client.post(
+            '/api/token/',
+            {'username': 'alice', 'password': 'password123'},
+            HTTP_ACCEPT_ENCODING='gzip, br',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class ChatsAPITestCase(TestCase):
+    """Shared fixtures: two participants exchanging messages."""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.conversation = Conversation.objects.create(title='Chat')
+        self.conversation.participants.set([self.alice, self.bob])
+        for sender in (self.alice, self.bob, self.alice, self.bob):
+            Message.objects.create(
+                conversation=self.conversation, sender=sender, message_body='hi'
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+
+@skipIf(msgpack is None, 'msgpack is not installed')
+class MessagePackTests(ChatsAPITestCase):
+    """Tests for MessagePack content negotiation."""
+
+    def test_round_trip(self):
+        response = self.client.post(
+            '/api/messages/',
+            data=msgpack.packb({
+                'conversation': str(self.conversation.conversation_id),
+                'message_body': 'packed',
+            }),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = msgpack.unpackb(response.content)
+        self.assertEqual(data['message_body'], 'packed')
+        self.assertEqual(data['conversation'], str(self.conversation.conversation_id))
+        self.assertEqual(data['sender']['user_id'], str(self.alice.user_id))
+
+    def test_format_query_parameter(self):
+        response = self.client.get('/api/messages/?format=msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(msgpack.unpackb(response.content)), 4)
+
+
+class NormalizedShapeTests(ChatsAPITestCase):
+    """Tests for the `?shape=normalized` list responses."""
+
+    def test_messages_send_each_user_once(self):
+        data = self.client.get('/api/messages/?shape=normalized').json()
+        self.assertEqual(
+            set(data['users']), {str(self.alice.user_id), str(self.bob.user_id)}
+        )
+        self.assertEqual(len(data['results']), 4)
+        for message in data['results']:
+            self.assertIn(message['sender'], data['users'])
+
+    def test_conversations_send_each_user_once(self):
+        data = self.client.get('/api/conversations/?shape=normalized').json()
+        self.assertEqual(
+            set(data['users']), {str(self.alice.user_id), str(self.bob.user_id)}
+        )
+        conversation = data['results'][0]
+        self.assertEqual(
+            set(conversation['participants']), set(data['users'])
+        )
+        self.assertEqual(conversation['participant_count'], 2)
+        self.assertTrue(all(m['sender'] in data['users'] for m in conversation['messages']))
+
+    def test_default_shape_is_unchanged(self):
+        data = self.client.get('/api/messages/').json()
+        self.assertEqual(data[0]['sender']['username'], 'alice')
+
+    def test_paginated_users_sit_next_to_results(self):
+        class OnePerPage(PageNumberPagination):
+            page_size = 1
+
+        with mock.patch.object(MessageViewSet, 'pagination_class', OnePerPage):
+            data = self.client.get('/api/messages/?shape=normalized').json()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(list(data['users']), [data['results'][0]['sender']])
+
+
+class BucketThrottle(TokenBucketThrottle):
+    rate = '3/min'
+
+    def get_cache_key(self, request, view):
+        return 'throttle_test_bucket'
+
+
+class TokenBucketThrottleTests(TestCase):
+    """Tests for the token-bucket arithmetic."""
+
+    def setUp(self):
+        cache.clear()
+        self.request = Request(RequestFactory().get('/'))
+        self.now = 1000.0
+
+    def allow(self):
+        throttle = BucketThrottle()
+        throttle.timer = lambda: self.now
+        return throttle, throttle.allow_request(self.request, None)
+
+    def test_burst_then_reject(self):
+        for _ in range(3):
+            self.assertTrue(self.allow()[1])
+        throttle, allowed = self.allow()
+        self.assertFalse(allowed)
+        # One token refills every 60 / 3 seconds
+        self.assertAlmostEqual(throttle.wait(), 20)
+
+    def test_refill(self):
+        for _ in range(3):
+            self.allow()
+        self.now += 10
+        throttle, allowed = self.allow()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 10)
+        self.now += 10
+        self.assertTrue(self.allow()[1])
+        self.assertFalse(self.allow()[1])
+
+    def test_bucket_is_capped(self):
+        self.allow()
+        self.now += 3600
+        for _ in range(3):
+            self.assertTrue(self.allow()[1])
+        self.assertFalse(self.allow()[1])
+
+
+class ThrottleScopeTests(ChatsAPITestCase):
+    """Tests for the per-user and per-conversation budgets."""
+
+    def setUp(self):
+        super().setUp()
+        self.carol = make_user('carol')
+        self.other_conversation = Conversation.objects.create(title='Other')
+        self.other_conversation.participants.set([self.alice, self.carol])
+
+    def rates(self, **rates):
+        defaults = {'user_read': '100/min', 'user_write': '100/min', 'conversation_write': '100/min'}
+        return mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {**defaults, **rates})
+
+    def post_message(self, user, conversation):
+        self.client.force_authenticate(user)
+        return self.client.post('/api/messages/', {
+            'conversation': str(conversation.conversation_id),
+            'message_body': 'hi',
+        })
+
+    def test_user_read_budget(self):
+        with self.rates(user_read='2/min'):
+            for _ in range(2):
+                self.assertEqual(self.client.get('/api/messages/').status_code, 200)
+            response = self.client.get('/api/messages/')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+            # Writes have their own budget
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 201)
+
+    def test_user_write_budget(self):
+        with self.rates(user_write='1/min'):
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 201)
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 429)
+            self.assertEqual(self.client.get('/api/messages/').status_code, 200)
+            # Other users are unaffected
+            self.assertEqual(self.post_message(self.bob, self.conversation).status_code, 201)
+
+    def test_conversation_write_budget_is_shared_by_participants(self):
+        with self.rates(conversation_write='1/min'):
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 201)
+            self.assertEqual(self.post_message(self.bob, self.conversation).status_code, 429)
+            self.assertEqual(self.post_message(self.bob, self.other_conversation).status_code, 403)
+
+    def test_non_participant_cannot_drain_conversation_budget(self):
+        with self.rates(conversation_write='1/min'):
+            for _ in range(3):
+                self.assertEqual(self.post_message(self.carol, self.conversation).status_code, 403)
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 201)
+
+    def test_updates_are_not_charged_to_conversation(self):
+        message = Message.objects.filter(sender=self.alice).first()
+        with self.rates(conversation_write='1/min'):
+            response = self.client.patch(f'/api/messages/{message.message_id}/', {
+                'conversation': str(self.conversation.conversation_id),
+                'message_body': 'edited',
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 201)
+
+    def test_rejected_request_spends_no_tokens(self):
+        with self.rates(user_write='2/min', conversation_write='1/min'):
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 201)
+            # Rejected by the conversation budget: the user budget keeps its token
+            self.assertEqual(self.post_message(self.alice, self.conversation).status_code, 429)
+            self.assertEqual(
+                self.post_message(self.alice, self.other_conversation).status_code, 201
+            )
+
+
+class LoginThrottleTests(TestCase):
+    """Tests for the token/ endpoint budget."""
+
+    def setUp(self):
+        cache.clear()
+        make_user('alice')
+
+    def login(self, **extra):
+        return self.client.post(
+            '/api/token/', {'username': 'alice', 'password': 'wrong-password'}, **extra
+        )
+
+    def test_budget_per_address_ignores_forwarded_for(self):
+        rates = {'login': '2/min'}
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', rates):
+            for address in ('1.1.1.1', '2.2.2.2'):
+                self.assertEqual(self.login(HTTP_X_FORWARDED_FOR=address).status_code, 401)
+            response = self.login(HTTP_X_FORWARDED_FOR='3.3.3.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+    def test_other_addresses_can_still_log_in(self):
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'login': '1/min'}):
+            self.assertEqual(self.login(REMOTE_ADDR='10.0.0.1').status_code, 401)
+            self.assertEqual(self.login(REMOTE_ADDR='10.0.0.1').status_code, 429)
+            response = self.client.post(
+                '/api/token/', {'username': 'alice', 'password': 'password123'},
+                REMOTE_ADDR='10.0.0.2',
+            )
+        self.assertEqual(response.status_code, 200)
+
+
+class LoadSheddingTests(ChatsAPITestCase):
+    """Tests for shedding polling traffic while the database is slow."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(setattr, db_latency, 'last_sample', None)
+
+    def degrade(self, age=0):
+        db_latency.average = 1.0
+        db_latency.last_sample = time.monotonic() - age
+
+    def test_monitor_goes_stale(self):
+        monitor = DatabaseLatencyMonitor()
+        self.assertFalse(monitor.is_degraded())
+        for _ in range(3):
+            monitor.record(1.0)
+        self.assertTrue(monitor.is_degraded())
+        later = time.monotonic() + 31
+        with mock.patch.object(latency.time, 'monotonic', return_value=later):
+            self.assertFalse(monitor.is_degraded())
+
+    def test_single_slow_query_after_quiet_period_is_smoothed(self):
+        monitor = DatabaseLatencyMonitor()
+        monitor.record(1.0)
+        self.assertFalse(monitor.is_degraded())
+        for _ in range(3):
+            monitor.record(1.0)
+        later = time.monotonic() + 31
+        with mock.patch.object(latency.time, 'monotonic', return_value=later):
+            monitor.record(1.0)
+            self.assertFalse(monitor.is_degraded())
+
+    def test_list_is_shed_while_degraded(self):
+        self.degrade()
+        response = self.client.get('/api/messages/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        # Higher-priority requests still go through
+        message = Message.objects.first()
+        self.assertEqual(self.client.get(f'/api/messages/{message.message_id}/').status_code, 200)
+
+    def test_shed_request_spends_no_read_token(self):
+        rates = {'user_read': '1/min', 'user_write': '100/min', 'conversation_write': '100/min'}
+        with mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', rates):
+            self.degrade()
+            self.assertEqual(self.client.get('/api/messages/').status_code, 429)
+            db_latency.last_sample = None
+            self.assertEqual(self.client.get('/api/messages/').status_code, 200)
+
+    def test_list_allowed_once_stale(self):
+        self.degrade(age=31)
+        self.assertEqual(self.client.get('/api/messages/').status_code, 200)
 
-# Create your tests here.
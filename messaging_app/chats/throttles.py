@@ -0,0 +1,160 @@
+import uuid
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+from chats.latency import db_latency, load_shedding_setting
+from chats.models import Conversation
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token-bucket variant of SimpleRateThrottle. A rate of 'N/period' is a
+    bucket holding up to N tokens, refilled continuously at N per period:
+    clients may burst up to N requests, then proceed at the sustained rate.
+
+    Buckets are stored in the default cache, so every worker shares them
+    when CACHES points at a shared backend such as Redis.
+
+    `check()` only inspects the bucket and `consume()` takes the token, so
+    ShortCircuitThrottleMixin can charge a request only once every throttle
+    has let it through. `allow_request()` does both, as DRF expects.
+    """
+
+    def allow_request(self, request, view):
+        if not self.check(request, view):
+            return False
+        self.consume()
+        return True
+
+    def check(self, request, view):
+        self.key = None
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        tokens, last_refill = self.cache.get(self.key, (self.num_requests, self.now))
+        refilled = (self.now - last_refill) * self.num_requests / self.duration
+        self.tokens = min(self.num_requests, tokens + refilled)
+
+        if self.tokens < 1:
+            return self.throttle_failure()
+        return True
+
+    def consume(self):
+        """
+        Take a token from the bucket checked last. An untouched bucket
+        refills completely within one period, so the entry can expire then.
+        """
+        if self.key is None:
+            return
+        self.tokens -= 1
+        self.cache.set(self.key, (self.tokens, self.now), self.duration)
+
+    def wait(self):
+        """
+        Return the time until the next token is available.
+        """
+        return (1 - self.tokens) * self.duration / self.num_requests
+
+
+class ShortCircuitThrottleMixin:
+    """
+    Evaluate throttles in order and stop at the first rejection. Token
+    buckets are only charged once every throttle has allowed the request,
+    so a rejected request spends no tokens.
+    """
+
+    def check_throttles(self, request):
+        throttles = self.get_throttles()
+        for throttle in throttles:
+            if isinstance(throttle, TokenBucketThrottle):
+                allowed = throttle.check(request, self)
+            else:
+                allowed = throttle.allow_request(request, self)
+            if not allowed:
+                self.throttled(request, throttle.wait())
+
+        for throttle in throttles:
+            if isinstance(throttle, TokenBucketThrottle):
+                throttle.consume()
+
+
+class UserReadThrottle(TokenBucketThrottle):
+    """
+    Budget for safe (read) requests made by an authenticated user.
+    """
+    scope = 'user_read'
+
+    def get_cache_key(self, request, view):
+        if request.method not in SAFE_METHODS or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class UserWriteThrottle(TokenBucketThrottle):
+    """
+    Budget for unsafe (write) requests made by an authenticated user.
+    """
+    scope = 'user_write'
+
+    def get_cache_key(self, request, view):
+        if request.method in SAFE_METHODS or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class ConversationWriteThrottle(TokenBucketThrottle):
+    """
+    Budget for messages posted to a single conversation, shared by all of
+    its participants. Only message creation by a participant is charged,
+    so outsiders cannot drain a conversation's bucket.
+    """
+    scope = 'conversation_write'
+
+    def get_cache_key(self, request, view):
+        if getattr(view, 'action', None) != 'create' or not request.user.is_authenticated:
+            return None
+        if not hasattr(request.data, 'get'):
+            return None
+        try:
+            conversation_id = uuid.UUID(str(request.data.get('conversation')))
+        except ValueError:
+            # Let the serializer report a missing or malformed conversation
+            return None
+        if not Conversation.objects.filter(
+            pk=conversation_id, participants=request.user
+        ).exists():
+            # perform_create rejects non-participants
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': conversation_id}
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """
+    Budget for token requests, keyed by client address. The address comes
+    from REST_FRAMEWORK['NUM_PROXIES'], which must match the deployment.
+    """
+    scope = 'login'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoadSheddingThrottle(BaseThrottle):
+    """
+    Reject low-priority traffic - list (polling) requests - while the
+    database latency average is above LOAD_SHEDDING['DB_LATENCY_THRESHOLD'].
+    """
+
+    def allow_request(self, request, view):
+        if request.method not in SAFE_METHODS or getattr(view, 'action', None) != 'list':
+            return True
+        return not db_latency.is_degraded()
+
+    def wait(self):
+        return load_shedding_setting('RETRY_AFTER')
@@ -4,14 +4,113 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from chats.models import Conversation, Message, User
-from chats.serializers import ConversationSerializer, MessageSerializer, UserSerializer
+from chats.serializers import (
+    ConversationSerializer,
+    MessageSerializer,
+    NormalizedConversationSerializer,
+    NormalizedMessageSerializer,
+    UserSerializer,
+)
 from rest_framework.exceptions import PermissionDenied
 from chats.permissions import IsParticipantOfConversation
+from chats.throttles import (
+    ConversationWriteThrottle,
+    LoadSheddingThrottle,
+    ShortCircuitThrottleMixin,
+    UserReadThrottle,
+    UserWriteThrottle,
+)
 
 # Create your views here.
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def _resolve_user_ids(obj, path):
+    """
+    Yield the user ids found by following a dotted attribute `path` from
+    `obj`, iterating over related managers along the way.
+    """
+    attr, _, rest = path.partition('.')
+    value = getattr(obj, attr)
+    for item in (value.all() if hasattr(value, 'all') else [value]):
+        if rest:
+            yield from _resolve_user_ids(item, rest)
+        elif item is not None:
+            yield getattr(item, 'pk', item)
+
+
+class NormalizedResponseMixin:
+    """
+    Serve `?shape=normalized` list responses, in which each referenced
+    user is sent once in a top-level `users` map keyed by user_id
+    instead of being nested in every row.
+
+    `normalized_user_paths` lists the dotted attribute paths, from each
+    listed instance, to the users it references (e.g. 'sender_id' or
+    'messages.sender_id').
+    """
+    normalized_serializer_class = None
+    normalized_user_paths = None
+    normalized_prefetch = ()
+
+    def is_normalized(self):
+        request = getattr(self, 'request', None)
+        return request is not None and \
+            request.query_params.get('shape') == 'normalized'
+
+    def get_serializer_class(self):
+        if self.action == 'list' and self.is_normalized():
+            assert self.normalized_serializer_class is not None, (
+                "'%s' should include a `normalized_serializer_class` attribute."
+                % self.__class__.__name__
+            )
+            return self.normalized_serializer_class
+        return super().get_serializer_class()
+
+    def get_referenced_user_ids(self, instances):
+        """
+        Return the ids of the users referenced by the listed instances.
+        """
+        assert self.normalized_user_paths is not None, (
+            "'%s' should include a `normalized_user_paths` attribute."
+            % self.__class__.__name__
+        )
+        user_ids = set()
+        for instance in instances:
+            for path in self.normalized_user_paths:
+                user_ids.update(_resolve_user_ids(instance, path))
+        return user_ids
+
+    def get_users_map(self, instances):
+        users = UserSerializer(
+            User.objects.filter(user_id__in=self.get_referenced_user_ids(instances)),
+            many=True
+        ).data
+        return {str(user['user_id']): user for user in users}
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_normalized():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(
+            *self.normalized_prefetch
+        )
+        page = self.paginate_queryset(queryset)
+        instances = page if page is not None else list(queryset)
+        serializer = self.get_serializer(instances, many=True)
+        users = self.get_users_map(instances)
+
+        if page is not None:
+            # Keep `users` next to the paginator's own `results`
+            response = self.get_paginated_response(serializer.data)
+            response.data['users'] = users
+            return response
+        return Response({
+            'users': users,
+            'results': serializer.data,
+        })
+
+
+class UserViewSet(ShortCircuitThrottleMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing users.
     """
@@ -53,15 +152,24 @@ class UserViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Only admins can delete users.")
         instance.delete()
 
-class ConversationViewSet(viewsets.ModelViewSet):
+class ConversationViewSet(ShortCircuitThrottleMixin, NormalizedResponseMixin,
+                          viewsets.ModelViewSet):
     """
     ViewSet for listing, retrieving, and creating conversations.
     """
     serializer_class = ConversationSerializer
+    normalized_serializer_class = NormalizedConversationSerializer
+    normalized_user_paths = ('participants', 'messages.sender_id')
+    normalized_prefetch = ('participants', 'messages')
     permission_classes = [
         IsAuthenticated,
         IsParticipantOfConversation
     ]
+    throttle_classes = [
+        LoadSheddingThrottle,
+        UserReadThrottle,
+        UserWriteThrottle
+    ]
 
     def get_queryset(self):
         """
@@ -103,15 +211,24 @@ class ConversationViewSet(viewsets.ModelViewSet):
         instance.delete()
 
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(ShortCircuitThrottleMixin, NormalizedResponseMixin,
+                     viewsets.ModelViewSet):
     """
     ViewSet for listing, retrieving, and creating messages.
     """
     serializer_class = MessageSerializer
+    normalized_serializer_class = NormalizedMessageSerializer
+    normalized_user_paths = ('sender_id',)
     permission_classes = [
         IsAuthenticated,
         IsParticipantOfConversation
     ]
+    throttle_classes = [
+        LoadSheddingThrottle,
+        UserReadThrottle,
+        UserWriteThrottle,
+        ConversationWriteThrottle
+    ]
 
     def get_queryset(self):
         """
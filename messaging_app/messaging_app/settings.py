@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 import environ
 import os
@@ -63,17 +64,48 @@ REST_FRAMEWORK = {
          'rest_framework_simplejwt.authentication.JWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.TokenAuthentication',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    # Token-bucket budgets ('N/period' = burst of N, refilled at N per period)
+    'DEFAULT_THROTTLE_CLASSES': [
+        'chats.throttles.UserReadThrottle',
+        'chats.throttles.UserWriteThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user_read': '120/min',
+        'user_write': '30/min',
+        'conversation_write': '60/min',
+        'login': '5/min',
+    },
+    # Number of trusted proxies in front of the app; 0 uses REMOTE_ADDR and
+    # ignores the client-supplied X-Forwarded-For header
+    'NUM_PROXIES': env.int('NUM_PROXIES', default=0),
 }
 
+# MessagePack is served on `Accept: application/msgpack` or `?format=msgpack`
+# when the optional msgpack package is installed
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('chats.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('chats.renderers.MessagePackParser')
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'chats.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'chats.middleware.DatabaseLatencyMiddleware',
 ]
 
 ROOT_URLCONF = 'messaging_app.urls'
@@ -119,6 +151,15 @@ DATABASES = {
 }
 
 
+# Cache
+# Throttle buckets live here; point CACHE_URL at a shared backend
+# (e.g. redis://127.0.0.1:6379/1) so all workers see the same counters.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -172,3 +213,13 @@ SIMPLE_JWT = {
     # 'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+# Brotli/gzip response compression (chats.middleware.CompressionMiddleware).
+# Defaults live in chats.middleware.DEFAULTS; override individual keys with
+# RESPONSE_COMPRESSION = {'MIN_SIZE': ...}
+
+# Shed polling (list) requests with 429 while the database is slow
+# (chats.latency, chats.middleware.DatabaseLatencyMiddleware,
+# chats.throttles.LoadSheddingThrottle).
+# Defaults live in chats.latency.LOAD_SHEDDING_DEFAULTS; override individual
+# keys with LOAD_SHEDDING = {'DB_LATENCY_THRESHOLD': ...}